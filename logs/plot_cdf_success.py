@@ -15,113 +15,137 @@ Usage
     python plot_cdf_success_flexible.py pid.csv mpc.csv
 Produces `<impl>_cdf.png` and a combined `cdf_success.png`.
 """
-import sys, csv, pathlib, math
+import sys, pathlib
 from collections import defaultdict
 import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")                    # file output only; no GUI backend
 import matplotlib.pyplot as plt
-plt.rcParams.update({"figure.dpi": 120, "font.size": 10})
-
-if len(sys.argv) < 2:
-    print("Usage: plot_cdf_success_flexible.py file1.csv [file2.csv …]")
-    sys.exit(1)
+plt.rcParams.update({"font.size": 10})
 
 STATUS_SET = {"success", "timeout", "stall", "fail", "failure"}
 COLORS = plt.cm.tab10.colors
-
-impl2times:   dict[str, list[float]] = defaultdict(list)   # successful
-impl2total:   dict[str, int]          = defaultdict(int)    # all trials
+CDF_BINS = 300          # above this many successes, bin instead of sorting
 
 # ───────────────────────────────── ingest CSVs ───────────────────────
-for csv_path in map(pathlib.Path, sys.argv[1:]):
-    if not csv_path.exists():
-        print(f"[warn] {csv_path} not found – skipping")
-        continue
-
-    with csv_path.open(newline="") as fh:
-        reader = csv.reader(fh)
-        for row in reader:
-            if not row:
-                continue
+def read_rows(csv_path):
+    """ragged CSV → string DataFrame (short rows padded with '')"""
+    with csv_path.open() as fh:
+        width = max((ln.count(",") + 1 for ln in fh), default=0)
+    if width == 0:
+        return pd.DataFrame()
+    return pd.read_csv(csv_path, header=None, names=range(width), dtype=str,
+                       engine="c", na_filter=False)
+
+def ingest(csv_path):
+    """one CSV → ({impl: total trials}, {impl: [success times]})"""
+    df = read_rows(csv_path)
+    totals, times = {}, {}
+    if df.empty:
+        return totals, times
+    cells = df.apply(lambda c: c.str.strip())
+    impl  = cells[0]
+    for name, n in impl.groupby(impl, sort=False).size().items():
+        totals[name] = int(n)                  # count every trial
+
+    # locate status column dynamically (first match per row)
+    rows       = np.arange(len(df))
+    lower      = cells.apply(lambda c: c.str.lower()).to_numpy()
+    hit        = np.isin(lower, list(STATUS_SET))
+    status_idx = hit.argmax(axis=1)
+    status_val = lower[rows, status_idx]
+    succ       = hit.any(axis=1) & (status_val == "success")
+
+    # -------- success time extraction (vectorised) -----------------
+    num = cells.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    # 1) first finite numeric cell **after** status
+    cand     = np.isfinite(num) & (np.arange(df.shape[1]) > status_idx[:, None])
+    t_finish = np.where(cand.any(axis=1), num[rows, cand.argmax(axis=1)], np.nan)
+    # 2) total_sec (col‑2)
+    if df.shape[1] > 2:
+        fill = np.isnan(t_finish) & np.isfinite(num[:, 2])
+        t_finish[fill] = num[fill, 2]
+    # 3) max "Ns:err" timestamp
+    ts = cells.apply(lambda c: pd.to_numeric(c.str.extract(r"^(\d+)s:", expand=False),
+                                             errors="coerce")).max(axis=1).to_numpy()
+    fill = np.isnan(t_finish)
+    t_finish[fill] = ts[fill]
+
+    keep = succ & ~np.isnan(t_finish)
+    for name, t in pd.Series(t_finish[keep]).groupby(impl[keep].to_numpy(), sort=False):
+        times[name] = t.tolist()
+    return totals, times
 
-            impl = row[0].strip()
-            impl2total[impl] += 1              # count every trial
-
-            # locate status column dynamically
-            status_idx = None; status_val = None
-            for i, cell in enumerate(row):
-                v = cell.strip().lower()
-                if v in STATUS_SET:
-                    status_idx, status_val = i, v
-                    break
-            if status_val != "success":
-                continue
+# ───────────────────────── plots ─────────────────────────────────────
+def cdf_curve(times, total_n):
+    """step‑plot (x, % of all trials); exact below CDF_BINS points, else binned"""
+    if times.size < CDF_BINS:
+        x = np.sort(times)
+        return x, np.arange(1, x.size + 1) / total_n * 100.0  # denom = total trials
+    hist, edges = np.histogram(times, bins=np.linspace(0, times.max(), CDF_BINS + 1))
+    return edges[1:], np.cumsum(hist) / total_n * 100.0
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: plot_cdf_success_flexible.py file1.csv [file2.csv …]")
+        sys.exit(1)
+
+    impl2times:   dict[str, list[float]] = defaultdict(list)   # successful
+    impl2total:   dict[str, int]          = defaultdict(int)    # all trials
+
+    paths = []
+    for csv_path in map(pathlib.Path, sys.argv[1:]):
+        if not csv_path.exists():
+            print(f"[warn] {csv_path} not found – skipping")
+            continue
+        paths.append(csv_path)
 
-            # -------- success time extraction ------------------------
-            t_finish = None
-            # 1) first finite numeric cell **after** status
-            for cell in row[status_idx + 1:]:
-                try:
-                    num = float(cell)
-                    if math.isfinite(num):
-                        t_finish = num; break
-                except ValueError:
-                    continue
-            # 2) total_sec (col‑2)
-            if t_finish is None and len(row) > 2:
-                try:
-                    num = float(row[2])
-                    if math.isfinite(num):
-                        t_finish = num
-                except ValueError:
-                    pass
-            # 3) max "Ns:err" timestamp
-            if t_finish is None:
-                ts = [int(c.split('s:')[0]) for c in row if 's:' in c]
-                if ts:
-                    t_finish = max(ts)
-            if t_finish is not None:
-                impl2times[impl].append(t_finish)
+    for totals, times in map(ingest, paths):
+        for name, n in totals.items():
+            impl2total[name] += n
+        for name, t in times.items():
+            impl2times[name].extend(t)
 
-# ───────────────────────── plots ─────────────────────────────────────
-if not impl2times:
-    print("No successful trials found.")
-    sys.exit(0)
-
-# per‑file -----------------------------------------------------------
-for idx, impl in enumerate(impl2total):
-    total_n = impl2total[impl]
-    succ_times = np.array(impl2times.get(impl, []), dtype=float)
-    succ_times.sort()
-    if succ_times.size == 0:
-        print(f"[warn] {impl}: 0 successes; skipping individual plot")
-        continue
-    y = np.arange(1, succ_times.size + 1) / total_n * 100.0  # denom = total trials
+    if not impl2times:
+        print("No successful trials found.")
+        sys.exit(0)
 
+    # per‑file (one Figure, cleared between impls) --------------------
     fig, ax = plt.subplots()
-    ax.step(succ_times, y, where="post", color=COLORS[idx % 10])
-    ax.set_title(f"CDF – {impl}  (success {len(succ_times)}/{total_n})")
-    ax.set_xlabel("Time to finish (s)")
-    ax.set_ylabel("Success of all trials (%)")
-    ax.set_ylim(0, 100); ax.grid(True, alpha=.3)
-    fig.tight_layout(); fig.savefig(f"{impl}_cdf.png")
-    print(f"wrote {impl}_cdf.png")
-
-# combined -----------------------------------------------------------
-if len(impl2total) > 1:
-    fig, ax = plt.subplots()
-    ax.set_title("CDF of success times – all implementations")
-    ax.set_xlabel("Time to finish (s)")
-    ax.set_ylabel("Success of all trials (%)")
-    ax.set_ylim(0, 100); ax.grid(True, alpha=.3)
-
-    for idx, impl in enumerate(sorted(impl2total)):
+    for idx, impl in enumerate(impl2total):
         total_n = impl2total[impl]
-        times = np.array(impl2times.get(impl, []), dtype=float)
-        times.sort()
-        if times.size == 0:
+        succ_times = np.array(impl2times.get(impl, []), dtype=float)
+        if succ_times.size == 0:
+            print(f"[warn] {impl}: 0 successes; skipping individual plot")
             continue
-        y = np.arange(1, times.size + 1) / total_n * 100.0
-        ax.step(times, y, where="post", color=COLORS[idx % 10], label=f"{impl} ({len(times)}/{total_n})")
+        x, y = cdf_curve(succ_times, total_n)
+
+        ax.clear()
+        ax.step(x, y, where="post", color=COLORS[idx % 10])
+        ax.set_title(f"CDF – {impl}  (success {len(succ_times)}/{total_n})")
+        ax.set_xlabel("Time to finish (s)")
+        ax.set_ylabel("Success of all trials (%)")
+        ax.set_ylim(0, 100); ax.grid(True, alpha=.3)
+        fig.tight_layout(); fig.savefig(f"{impl}_cdf.png", dpi=100)
+        print(f"wrote {impl}_cdf.png")
+    plt.close(fig)
+
+    # combined -----------------------------------------------------------
+    if len(impl2total) > 1:
+        fig, ax = plt.subplots()
+        ax.set_title("CDF of success times – all implementations")
+        ax.set_xlabel("Time to finish (s)")
+        ax.set_ylabel("Success of all trials (%)")
+        ax.set_ylim(0, 100); ax.grid(True, alpha=.3)
+
+        for idx, impl in enumerate(sorted(impl2total)):
+            total_n = impl2total[impl]
+            times = np.array(impl2times.get(impl, []), dtype=float)
+            if times.size == 0:
+                continue
+            x, y = cdf_curve(times, total_n)
+            ax.step(x, y, where="post", color=COLORS[idx % 10], label=f"{impl} ({len(times)}/{total_n})")
 
-    ax.legend(); fig.tight_layout(); fig.savefig("cdf_success.png")
-    print("wrote cdf_success.png")
+        ax.legend(); fig.tight_layout(); fig.savefig("cdf_success.png", dpi=100)
+        print("wrote cdf_success.png")
@@ -10,7 +10,7 @@ Visualise per‑second cube‑goal error traces.
 
 Usage
 -----
-python plot_trials_ribbon.py  run_pid.csv  run_mpc.csv
+python plot_trials_ribbon.py  run_pid.csv  run_mpc.csv  [--combined-only]
 
 Outputs
 -------
@@ -18,111 +18,150 @@ run_pid.png       – all PID trials
 run_mpc.png       – all MPC trials
 combined.png      – overlay of the mean±σ ribbon for each impl
 ```"""
-import sys, csv, re, pathlib, numpy as np
+import sys, pathlib, numpy as np
+import pandas as pd
+import bottleneck as bn
 from pathlib import Path
+import matplotlib
+matplotlib.use("Agg")                    # file output only; no GUI backend
 import matplotlib.pyplot as plt
-plt.rcParams.update({"figure.dpi": 120, "font.size": 10})
-
-if len(sys.argv) < 2:
-    print("Usage: plot_trials_ribbon.py file1.csv [file2.csv …]")
-    sys.exit(1)
+from matplotlib.collections import LineCollection
+plt.rcParams.update({"font.size": 10})
 
 # ─── helpers ─────────────────────────────────────────────────
-PAT = re.compile(r"^(\d+)s:([\d.]+)")
-
-def row_pairs(row):
-    """return list[(sec,int), err(float)] from a CSV row"""
-    pairs = []
-    for cell in row:
-        m = PAT.match(cell.strip())
-        if m:
-            sec, err = int(m.group(1)), float(m.group(2))
-            pairs.append((sec, err))
-    return pairs
-
-colors = plt.cm.tab10.colors
-impl_color = {}
-impl_ribbon_data = {}
-
-for file_idx, csv_path in enumerate(sys.argv[1:], 1):
-    p = pathlib.Path(csv_path)
-    if not p.exists():
-        print(f"[warn] {p} not found, skipping.")
-        continue
-
-    with p.open(newline="") as fh:
-        rows = [r for r in csv.reader(fh) if r]
-    if not rows:
-        print(f"[warn] {p} empty; skipping.")
-        continue
-
-    impl = rows[0][0]
-    colour = colors[(file_idx-1) % len(colors)]
-    impl_color[impl] = colour
+PAT = r"^\s*(\d+)s:([\d.]+)"
+
+def read_rows(path):
+    """ragged CSV → string DataFrame (short rows padded with '')"""
+    with path.open() as fh:
+        width = max((ln.count(",") + 1 for ln in fh), default=0)
+    if width == 0:
+        return pd.DataFrame()
+    return pd.read_csv(path, header=None, names=range(width), dtype=str,
+                       engine="c", na_filter=False)
+
+def file_pairs(df):
+    """long DataFrame [row, sec, err] of every 'Ns:err' cell, one regex sweep"""
+    m = df.stack().str.extract(PAT).dropna()
+    pairs = pd.DataFrame({"row": m.index.get_level_values(0),
+                          "sec": pd.to_numeric(m[0]).to_numpy(),
+                          "err": pd.to_numeric(m[1], errors="coerce",
+                                               downcast="float").to_numpy()})
+    return pairs.dropna()
+
+def decimate(t, e, n=1000):
+    """stride‑sample a trace down to n points; the plot is visual‑only"""
+    if len(t) <= 2*n:
+        return t, e
+    idx = np.linspace(0, len(t)-1, n).astype(int)
+    return t[idx], e[idx]
+
+def ingest(p):
+    """one CSV → (impl, all_secs, err_matrix, mean, std); None fields on bad input"""
+    df = read_rows(p)
+    if df.empty:
+        return None, None, None, None, None
+    impl = df.iat[0, 0]
 
     # --- gather trials --------------------------------------
-    trials = []
-    for row in rows:
-        pairs = row_pairs(row)
-        if pairs:
-            trials.append(pairs)
-    if not trials:
-        print(f"[warn] no 'Ns:err' pairs in {p}")
-        continue
-
-    # time grid (union of all seconds)
-    all_secs = sorted({sec for tr in trials for sec, _ in tr})
-    err_matrix = np.full((len(trials), len(all_secs)), np.nan)
-    sec_idx = {s:i for i,s in enumerate(all_secs)}
-    for r, tr in enumerate(trials):
-        for sec, err in tr:
-            err_matrix[r, sec_idx[sec]] = err
-    mean = np.nanmean(err_matrix, 0)
-    std  = np.nanstd (err_matrix, 0)
-    impl_ribbon_data[impl] = (all_secs, mean, std)
-
-    # --- per‑file plot --------------------------------------
-    fig, ax = plt.subplots()
-    ax.set_title(f"{impl} – per‑trial error")
-    ax.set_xlabel("Time (s)"); ax.set_ylabel("Error (m)"); ax.grid(True, alpha=.3)
-    # all finite errors in this file
-    valid_err = err_matrix[np.isfinite(err_matrix)]
-
-    ymin = max(valid_err.min(), 1e-4)     # clip at 1e‑4 so log(0) never occurs
-    ymax = valid_err.max() * 1.05         # 5 % head‑room
-
-    ax.set_yscale("log")
-    ax.set_ylim(ymin, ymax)
-
-    # (optional) tighten x‑axis too
-    ax.set_xlim(0, all_secs[-1])
-
-
-    # thin lines
-    for tr in trials:
-        t, e = zip(*tr)
-        e = np.maximum(e, 1e-4)   # avoid log(0)
-        ax.plot(t, e, color=colour, alpha=0.4, linewidth=0.8)
-    # mean ± σ ribbon
-    ax.plot(all_secs, mean, color=colour, linewidth=2)
-    ax.fill_between(all_secs, mean-std, mean+std, color=colour, alpha=.25)
-
-    fig.tight_layout()
-    out_png = p.with_name(p.stem + "_ribbon.png")   # or “…_trials.png”
-    fig.savefig(out_png)
-    print(f"wrote {out_png}")
-
-# ─── combined overlay (mean ± σ only) ───────────────────────
-if len(impl_ribbon_data) > 1:
-    fig, ax = plt.subplots()
-    ax.set_title("Combined mean ±1 σ")
-    ax.set_xlabel("Time (s)"); ax.set_ylabel("Error (m)")
-    ax.grid(True, alpha=.3); ax.set_yscale("log")
-
-    for impl, (secs, mean, std) in impl_ribbon_data.items():
-        c = impl_color[impl]
-        ax.plot(secs, mean, color=c, linewidth=2, label=impl)
-        ax.fill_between(secs, mean-std, mean+std, color=c, alpha=.25)
-
-    ax.legend(); fig.tight_layout(); fig.savefig("combined_ribbon.png")
-    print("wrote combined.png")
+    pairs = file_pairs(df)
+    if pairs.empty:
+        return impl, None, None, None, None
+
+    # trial × second matrix (union of all seconds as columns), one scatter
+    trial_ids, row_arr = np.unique(pairs["row"].to_numpy(), return_inverse=True)
+    all_secs,  sec_arr = np.unique(pairs["sec"].to_numpy(), return_inverse=True)
+    err_matrix = np.full((len(trial_ids), len(all_secs)), np.nan,
+                         dtype=np.float32)    # errors are logged to 3 d.p.
+    err_matrix[row_arr, sec_arr] = pairs["err"].to_numpy()
+    if np.isnan(err_matrix).any():        # ragged trials → NaN‑aware reducers
+        mean = bn.nanmean(err_matrix, axis=0)
+        std  = bn.nanstd (err_matrix, axis=0, ddof=0)
+    else:
+        mean = err_matrix.mean(0)
+        std  = err_matrix.std(0)
+    return impl, all_secs, err_matrix, mean, std
+
+if __name__ == "__main__":
+    COMBINED_ONLY = "--combined-only" in sys.argv      # skip the per‑file PNGs
+    sys.argv = [a for a in sys.argv if a != "--combined-only"]
+
+    if len(sys.argv) < 2:
+        print("Usage: plot_trials_ribbon.py file1.csv [file2.csv …] [--combined-only]")
+        sys.exit(1)
+
+    files = []                    # (colour slot, path) of every file that exists
+    for file_idx, csv_path in enumerate(sys.argv[1:], 1):
+        p = pathlib.Path(csv_path)
+        if not p.exists():
+            print(f"[warn] {p} not found, skipping.")
+            continue
+        files.append((file_idx, p))
+
+    colors = plt.cm.tab10.colors
+    impl_color = {}
+    impl_ribbon_data = {}
+    fig, ax = plt.subplots()      # per‑file plots share one Figure
+
+    for file_idx, p in files:
+        impl, all_secs, err_matrix, mean, std = ingest(p)
+        if impl is None:
+            print(f"[warn] {p} empty; skipping.")
+            continue
+        colour = colors[(file_idx-1) % len(colors)]
+        impl_color[impl] = colour
+        if err_matrix is None:
+            print(f"[warn] no 'Ns:err' pairs in {p}")
+            continue
+        impl_ribbon_data[impl] = (all_secs, mean, std)
+        if COMBINED_ONLY:             # overlay only needs the ribbon data
+            continue
+
+        # --- per‑file plot ----------------------------------
+        ax.clear()
+        ax.set_title(f"{impl} – per‑trial error")
+        ax.set_xlabel("Time (s)"); ax.set_ylabel("Error (m)"); ax.grid(True, alpha=.3)
+        # all finite errors in this file
+        valid_err = err_matrix[np.isfinite(err_matrix)]
+
+        ymin = max(valid_err.min(), 1e-4)     # clip at 1e‑4 so log(0) never occurs
+        ymax = valid_err.max() * 1.05         # 5 % head‑room
+
+        ax.set_yscale("log")
+        ax.set_ylim(ymin, ymax)
+
+        # (optional) tighten x‑axis too
+        ax.set_xlim(0, all_secs[-1])
+
+
+        # thin lines – one collection instead of a Line2D per trial
+        segs = []
+        for row in err_matrix:
+            ok = np.isfinite(row)
+            segs.append(np.column_stack(decimate(all_secs[ok],
+                                                 np.maximum(row[ok], 1e-4))))   # avoid log(0)
+        ax.add_collection(LineCollection(segs, colors=[colour], alpha=0.4, linewidths=0.8))
+        # mean ± σ ribbon
+        ax.plot(all_secs, mean, color=colour, linewidth=2)
+        ax.fill_between(all_secs, mean-std, mean+std, color=colour, alpha=.25)
+
+        fig.tight_layout()
+        out_png = p.with_name(p.stem + "_ribbon.png")   # or “…_trials.png”
+        fig.savefig(out_png, dpi=100)
+        print(f"wrote {out_png}")
+    plt.close(fig)
+
+    # ─── combined overlay (mean ± σ only) ───────────────────
+    if len(impl_ribbon_data) > 1:
+        fig, ax = plt.subplots()
+        ax.set_title("Combined mean ±1 σ")
+        ax.set_xlabel("Time (s)"); ax.set_ylabel("Error (m)")
+        ax.grid(True, alpha=.3); ax.set_yscale("log")
+
+        for impl, (secs, mean, std) in impl_ribbon_data.items():
+            c = impl_color[impl]
+            ax.plot(secs, mean, color=c, linewidth=2, label=impl)
+            ax.fill_between(secs, mean-std, mean+std, color=c, alpha=.25)
+
+        ax.legend(); fig.tight_layout(); fig.savefig("combined_ribbon.png", dpi=100)
+        print("wrote combined.png")
@@ -5,119 +5,157 @@ plot_trials_debug.py  – debugging version
   • prints detailed messages so we can trace what it sees
 """
 
-import sys, re, csv, pathlib
+import sys, pathlib
+import numpy as np
+import pandas as pd
 from pathlib import Path
+import matplotlib
+matplotlib.use("Agg")                    # file output only; no GUI backend
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 
 DEBUG = True            # turn off once it works
 
-if len(sys.argv) < 2:
-    print("Usage: plot_trials_debug.py file1.csv [file2.csv …]")
-    sys.exit(1)
-
 def dbg(msg):
     if DEBUG:
         print(msg)
 
-# ─── extract (sec,err) pairs from a CSV row ───────────────────
+# ─── read a ragged CSV as a string DataFrame ──────────────────
+def read_rows(csv_path):
+    with csv_path.open() as fh:
+        width = max((ln.count(",") + 1 for ln in fh), default=0)
+    if width == 0:
+        return pd.DataFrame()
+    return pd.read_csv(csv_path, header=None, names=range(width), dtype=str,
+                       engine="c", na_filter=False)
+
+# ─── extract (sec,err) pairs from every CSV row at once ───────
 # ---------------------------------------------------------------------
-def parse_row(row, row_idx, file_label):
+def parse_rows(df, file_label):
     """
-    Extract (sec, err) pairs from one CSV row, tolerant of extra spaces
-    or text.  Accepts any cell that contains the substring 's:'.
+    Extract (sec, err) pairs from all rows of a CSV in one vectorised
+    pass, tolerant of extra spaces or text.  Accepts any cell that
+    contains the substring 's:' and whose two halves int() / float()
+    can parse (so '3s:NaN', '3s:inf', '3s:1e-3' all count).
+    Returns [(row_idx, secs, errs), …] for every row that has at
+    least one pair.
     """
-    pairs = []
-    for field in row:
-        if "s:" not in field:
-            continue
+    cells = df.stack()
+    cells = cells[cells.str.contains("s:", regex=False)]
+    halves = cells.str.split("s:", n=1)                 # like field.split("s:", 1)
+    sec_s  = halves.str[0].str.strip()
+    err_s  = halves.str[1].str.strip()
+    sec = pd.to_numeric(sec_s.where(sec_s.str.fullmatch(r"[+-]?\d+")), errors="coerce")
+    err = pd.to_numeric(err_s, errors="coerce")
+    ok  = (sec.notna() & err.notna()).to_numpy(copy=True)
+    # leftovers (nan spellings, '1_000', …) are rare: let int()/float() decide
+    for k in np.flatnonzero(~ok):
         try:
-            sec_str, err_str = field.split("s:", 1)
-            sec = int(sec_str.strip())
-            err = float(err_str.strip())
-            pairs.append((sec, err))
+            s_k, e_k = int(sec_s.iat[k]), float(err_s.iat[k])
         except ValueError:
-            dbg(f"[{file_label}] row {row_idx}: could not parse '{field}'")
-    dbg(f"[{file_label}] row {row_idx}: found {len(pairs)} pairs")
-    return pairs
+            continue
+        sec.iat[k], err.iat[k], ok[k] = s_k, e_k, True
+    if DEBUG:
+        for (r, _), field in cells[~ok].items():
+            dbg(f"[{file_label}] row {r + 1}: could not parse '{field}'")
+    pairs = pd.DataFrame({"row": cells.index.get_level_values(0)[ok],
+                          "sec": sec[ok].to_numpy(dtype=int),
+                          "err": err[ok].to_numpy()})
+    if DEBUG:
+        counts = pairs.groupby("row").size().reindex(df.index, fill_value=0)
+        for r, n in counts.items():
+            dbg(f"[{file_label}] row {r + 1}: found {n} pairs")
+    return [(r, g["sec"].to_numpy(), g["err"].to_numpy())
+            for r, g in pairs.groupby("row")]
 # ---------------------------------------------------------------------
 
+def decimate(t, e, n=1000):
+    """stride‑sample a trace down to n points; the plot is visual‑only"""
+    if len(t) <= 2*n:
+        return t, e
+    idx = np.linspace(0, len(t)-1, n).astype(int)
+    return t[idx], e[idx]
 
 
-plt.rcParams.update({"figure.dpi": 120, "font.size": 10})
-colors = plt.cm.tab10.colors
-impl_handles = {}
-
-for file_idx, csv_path in enumerate(sys.argv[1:], 1):
-    csv_path = pathlib.Path(csv_path)
-    if not csv_path.exists():
-        print(f"[warn] {csv_path} not found, skipping.")
-        continue
-
-    with csv_path.open(newline='') as fh:
-        rows = [row for row in csv.reader(fh) if row]
-
-    if not rows:
-        print(f"[warn] {csv_path} empty, skipping.")
-        continue
-
-    impl_name = rows[0][0]
+def ingest(csv_path):
+    """one CSV → (impl_name, decimated trial segments); (None, []) when empty"""
+    df = read_rows(csv_path)
+    if df.empty:
+        return None, []
+    impl_name = df.iat[0, 0]
     dbg(f"Processing file {csv_path}  (impl = {impl_name})")
+    segs = [np.column_stack(decimate(t, e)) for _, t, e in parse_rows(df, impl_name)]
+    return impl_name, segs
 
-    fig, ax = plt.subplots()
-    ax.set_title(f"{impl_name} – per‑trial error")
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Error (m)")
-    ax.grid(True, alpha=0.3)
+if __name__ == "__main__":
+    COMBINED_ONLY = "--combined-only" in sys.argv      # skip the per‑file PNGs
+    sys.argv = [a for a in sys.argv if a != "--combined-only"]
 
-    colour = colors[(file_idx-1) % len(colors)]
-    plotted_any = False
+    if len(sys.argv) < 2:
+        print("Usage: plot_trials_debug.py file1.csv [file2.csv …] [--combined-only]")
+        sys.exit(1)
 
-    for r_idx, row in enumerate(rows, 1):
-        pairs = parse_row(row, r_idx, impl_name)
-        if not pairs:
+    files = []                    # (colour slot, path) of every file that exists
+    for file_idx, csv_path in enumerate(sys.argv[1:], 1):
+        csv_path = pathlib.Path(csv_path)
+        if not csv_path.exists():
+            print(f"[warn] {csv_path} not found, skipping.")
+            continue
+        files.append((file_idx, csv_path))
+
+    plt.rcParams.update({"font.size": 10})
+    colors = plt.cm.tab10.colors
+    impl_color = {}
+    parsed: dict[str, list[np.ndarray]] = {}   # impl → trial segments, reused by the overlay
+    fig, ax = plt.subplots()                   # per‑file plots share one Figure
+
+    for file_idx, csv_path in files:
+        impl_name, segs = ingest(csv_path)
+        if impl_name is None:
+            print(f"[warn] {csv_path} empty, skipping.")
+            continue
+
+        colour = colors[(file_idx-1) % len(colors)]
+        if not segs:
+            dbg(f"No valid 'Ns:err' pairs found in {csv_path}")
+            continue
+        impl_color[impl_name] = colour
+        parsed[impl_name] = segs
+        if COMBINED_ONLY:             # overlay only needs the parsed segments
             continue
-        t, e = zip(*pairs)
-        handle, = ax.plot(t, e, color=colour, alpha=0.7, linewidth=1)
-        plotted_any = True
 
-    if not plotted_any:
-        dbg(f"No valid 'Ns:err' pairs found in {csv_path}")
+        ax.clear()
+        ax.set_title(f"{impl_name} – per‑trial error")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Error (m)")
+        ax.grid(True, alpha=0.3)
+        ax.add_collection(LineCollection(segs, colors=[colour],
+                                         alpha=0.7, linewidths=1))
+        ax.autoscale_view()
 
-    if plotted_any:
-        impl_handles[impl_name] = (handle, colour)
         out_png = csv_path.with_name(csv_path.stem + "_trial.png")   # or “…_trials.png”
         fig.tight_layout()
-        fig.savefig(out_png)
+        fig.savefig(out_png, dpi=100)
         print(f"wrote {out_png}")
+    plt.close(fig)
+
+    # ─── combined overlay if we have multiple impls ───────────
+    if len(impl_color) > 1:
+        fig, ax = plt.subplots()
+        ax.set_title("Combined trials")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Error (m)")
+        ax.grid(True, alpha=0.3)
+
+        for impl_name, segs in parsed.items():   # no second read / parse
+            colour = impl_color[impl_name]
+            ax.add_collection(LineCollection(segs, colors=[colour], alpha=0.7,
+                                             linewidths=1, label=impl_name))
+
+        ax.autoscale_view()
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig("combined_rib.png", dpi=100)
+        print("wrote combined.png")
     else:
-        plt.close(fig)
-
-# ─── combined overlay if we have multiple impls ───────────────
-if len(impl_handles) > 1:
-    fig, ax = plt.subplots()
-    ax.set_title("Combined trials")
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Error (m)")
-    ax.grid(True, alpha=0.3)
-
-    for file_idx, csv_path in enumerate(sys.argv[1:], 1):
-        csv_path = pathlib.Path(csv_path)
-        with csv_path.open(newline='') as fh:
-            rows = [row for row in csv.reader(fh) if row]
-        impl_name = rows[0][0]
-        colour = impl_handles[impl_name][1]
-
-        for row in rows:
-            pairs = parse_row(row, 0, impl_name)   # reuse helper
-            if not pairs:
-                continue
-            t, e = zip(*pairs)
-            ax.plot(t, e, color=colour, alpha=0.7, linewidth=1,
-                    label=impl_name if row[1] == '1' else None)
-
-    ax.legend()
-    fig.tight_layout()
-    fig.savefig("combined_rib.png")
-    print("wrote combined.png")
-else:
-    dbg("combined plot skipped (only one impl)")
+        dbg("combined plot skipped (only one impl)")
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 """
 push_fast_v4.py  – proportional cube pusher with timeout + CSV logging
+
+Runs TRIALS (default 1) trials in one process, numbered from TRIAL_IDX,
+and prints one CSV line per trial.  Each trial's clock (total, t_finish,
+samples, MAX_TIME) starts ENV_BUILD_SEC before its env.reset(), so it still
+covers env startup as in the old one‑process‑per‑trial runs and stays
+comparable with logs/*.csv.
 """
-import os, sys, time, warnings, numpy as np, robosuite as suite
+import os, sys, time, traceback, warnings, numpy as np, robosuite as suite
 from robosuite import load_composite_controller_config
-from collections import deque
+from numba import njit
 
 warnings.filterwarnings("ignore")
 os.environ.update({"PYTHONWARNINGS": "ignore",
@@ -13,28 +19,11 @@ os.environ.update({"PYTHONWARNINGS": "ignore",
 # ─── timeout guard ────────────────────────────────────────────
 MAX_TIME = 180.0        # seconds before we declare failure
 
-# ─── metric buffers ───────────────────────────────────────────
-t0          = time.time()
-next_sample = 1.0        # sample every second
-samples     = []         # (sec, err)
-t_finish    = None       # when err ≤ 1 cm
-status      = "timeout"  # default until success
-
-# ─── build env ------------------------------------------------
-cfg = load_composite_controller_config(controller="BASIC")
-cfg["body_parts"]["right"]["type"] = "OSC_POSE"
-env = suite.make("Lift","Panda",
-                 controller_configs=cfg,
-                 renderer="mujoco", has_renderer=True,
-                 use_camera_obs=False, control_freq=60,
-                 ignore_done=True)
-obs = env.reset()
-
-# ─── task constants ------------------------------------------
-cube_xyz = obs["object-state"][:3]
-GOAL_XY  = cube_xyz[:2] + np.array([0.15, -0.10])
-TABLE_Z  = cube_xyz[2]
-WRIST_Z  = TABLE_Z + 0.001   # press depth
+# ─── rendering: every N control steps, 0 = headless ───────────
+RENDER_EVERY = int(os.environ.get("RENDER_EVERY", "300"))
+
+# ─── env build time, charged to every trial's clock (set in __main__)
+ENV_BUILD_SEC = 0.0
 
 # controller gains (unchanged) …
 APPROACH_HEIGHT=0.15; BASE_OFFSET=0.05
@@ -43,81 +32,151 @@ FADE_DIST=0.001; EXPONENT=2
 SPEED_XY=0.10; SPEED_Z=0.10
 TOL_FINE=0.015
 STALL_TIME=1.0; STALL_THRESH=0.002; REAPP_THRESH=0.15
-RENDER_EVERY=100
 DAMP = 0.15 
 
-# ─── main loop -----------------------------------------------
-phase="approach"; step=0
-stall_buf=deque(maxlen=int(STALL_TIME*env.control_freq))
-
-while True:
-    elapsed = time.time() - t0
-    if elapsed > MAX_TIME:                # timeout guard
-        break
-
-    cube_xy = obs["object-state"][:2]
-    ee_pos  = obs["robot0_eef_pos"]
-    err_vec = GOAL_XY - cube_xy
-    err     = np.linalg.norm(err_vec)
-    stall_buf.append(err)
-
-    # log once per second
-    while elapsed >= next_sample:
-        samples.append((int(next_sample), err))
-        next_sample += 1.0
-    if t_finish is None and err <= 0.01:
-        t_finish = elapsed
-
-    # success
-    if err < TOL_FINE:
-        status = "success"
-        break
-
-    # ----- phase machine --------------------------
-    if phase=="approach":
-        dir_u   = err_vec/(err+1e-9)
-        tgt_xy  = cube_xy - dir_u*BASE_OFFSET
-        tgt_z   = TABLE_Z + APPROACH_HEIGHT
-        if np.linalg.norm(ee_pos - np.r_[tgt_xy,tgt_z]) < 0.005:
-            phase="lower"
-    elif phase=="lower":
-        tgt_xy, tgt_z = ee_pos[:2], WRIST_Z + 0.001
-        if abs(ee_pos[2]-tgt_z) < 0.0008:
-            phase="push"; stall_buf.clear()
-    else:  # push
-        dir_u = err_vec/(err+1e-9)
-        lateral = np.linalg.norm(cube_xy - (ee_pos[:2]+dir_u*BASE_OFFSET))
-        if lateral>REAPP_THRESH: phase="approach"; continue
-        if len(stall_buf)==stall_buf.maxlen and (stall_buf[0]-err)<STALL_THRESH:
-            phase="approach"; continue
-
-        fade = np.clip((err/FADE_DIST)**EXPONENT + DAMP,0,1)
-        fwd  = max(PUSH_VEL_MAX*fade, PUSH_VEL_MIN if err>FADE_DIST else 0)
-        dxy  = dir_u*fwd - 0.5*(cube_xy-ee_pos[:2])
-        dz   = np.clip(WRIST_Z - ee_pos[2], -SPEED_Z, SPEED_Z)
-        dpos = np.clip(np.r_[dxy,dz], -SPEED_XY, SPEED_XY)
-        act  = np.zeros(env.action_dim); act[:3]=dpos; act[6]=1
+# ─── per‑step kernels (numba; tiny arrays, scalar math) ───────
+@njit(cache=True)
+def approach_target(cube_xy, goal_xy, z, tgt):
+    """BASE_OFFSET behind the cube on the goal line, at height z → tgt"""
+    ex, ey = goal_xy[0]-cube_xy[0], goal_xy[1]-cube_xy[1]
+    n = np.sqrt(ex*ex + ey*ey) + 1e-9
+    tgt[0] = cube_xy[0] - ex/n*BASE_OFFSET
+    tgt[1] = cube_xy[1] - ey/n*BASE_OFFSET
+    tgt[2] = z
+
+@njit(cache=True)
+def track(tgt, ee_pos, act):
+    """clipped position step towards tgt → act[:3]"""
+    for i in range(3):
+        act[i] = min(max(tgt[i] - ee_pos[i], -SPEED_XY), SPEED_XY)
+
+@njit(cache=True)
+def push_step(cube_xy, ee_pos, goal_xy, wrist_z, act):
+    """push command → act[:3]; returns the cube's lateral offset from the pusher"""
+    ex, ey = goal_xy[0]-cube_xy[0], goal_xy[1]-cube_xy[1]
+    err = np.sqrt(ex*ex + ey*ey)
+    ux, uy = ex/(err+1e-9), ey/(err+1e-9)
+    lx = cube_xy[0] - (ee_pos[0] + ux*BASE_OFFSET)
+    ly = cube_xy[1] - (ee_pos[1] + uy*BASE_OFFSET)
+
+    fade = min(max((err/FADE_DIST)**EXPONENT + DAMP, 0.0), 1.0)
+    fwd  = max(PUSH_VEL_MAX*fade, PUSH_VEL_MIN if err>FADE_DIST else 0.0)
+    act[0] = ux*fwd - 0.5*(cube_xy[0]-ee_pos[0])
+    act[1] = uy*fwd - 0.5*(cube_xy[1]-ee_pos[1])
+    act[2] = min(max(wrist_z - ee_pos[2], -SPEED_Z), SPEED_Z)
+    for i in range(3):
+        act[i] = min(max(act[i], -SPEED_XY), SPEED_XY)
+    return np.sqrt(lx*lx + ly*ly)
+
+def run_trial(trial):
+    """one push from a fresh env.reset(); returns the CSV line"""
+    t0  = time.time() - ENV_BUILD_SEC   # same time base as a fresh process
+    obs = env.reset()
+
+    # ─── metric buffers ───────────────────────────────────────
+    next_sample = 1.0        # sample every second
+    secs        = np.empty(int(MAX_TIME)+2, dtype=np.int32)   # sample buffers,
+    errs        = np.empty(secs.size, dtype=np.float32)      # one slot per second
+    n           = 0
+    t_finish    = None       # when err ≤ 1 cm
+    status      = "timeout"  # default until success
+
+    # ─── task constants (cube pose is re‑randomised per reset) ─
+    cube_xyz = obs["object-state"][:3]
+    GOAL_XY  = cube_xyz[:2] + np.array([0.15, -0.10])
+    TABLE_Z  = cube_xyz[2]
+    WRIST_Z  = TABLE_Z + 0.001   # press depth
+
+    # ─── main loop -------------------------------------------
+    phase="approach"; step=0
+    # stall window: ring of the last N errors; after a write, [stall_i] is the oldest
+    stall_n=int(STALL_TIME*env.control_freq)
+    stall_buf=np.empty(stall_n); stall_i=0; stall_filled=0
+    act = np.zeros(env.action_dim); act[6]=1    # reused every step, gripper fixed
+    tgt = np.empty(3)                           # approach / lower target
+
+    while True:
+        elapsed = time.time() - t0
+        if elapsed > MAX_TIME:                # timeout guard
+            break
+
+        cube_xy = obs["object-state"][:2]
+        ee_pos  = obs["robot0_eef_pos"]
+        err_vec = GOAL_XY - cube_xy
+        err     = np.linalg.norm(err_vec)
+        stall_buf[stall_i]=err
+        stall_i=(stall_i+1)%stall_n; stall_filled=min(stall_filled+1, stall_n)
+
+        # log once per second
+        while elapsed >= next_sample:
+            secs[n] = int(next_sample); errs[n] = err; n += 1
+            next_sample += 1.0
+        if t_finish is None and err <= 0.01:
+            t_finish = elapsed
+
+        # success
+        if err < TOL_FINE:
+            status = "success"
+            break
+
+        # ----- phase machine --------------------------
+        if phase=="approach":
+            approach_target(cube_xy, GOAL_XY, TABLE_Z + APPROACH_HEIGHT, tgt)
+            if np.linalg.norm(ee_pos - tgt) < 0.005:
+                phase="lower"
+        elif phase=="lower":
+            tgt[:2], tgt[2] = ee_pos[:2], WRIST_Z + 0.001
+            if abs(ee_pos[2]-tgt[2]) < 0.0008:
+                phase="push"; stall_filled=0
+        else:  # push
+            lateral = push_step(cube_xy, ee_pos, GOAL_XY, WRIST_Z, act)
+            if lateral>REAPP_THRESH: phase="approach"; continue
+            if stall_filled==stall_n and (stall_buf[stall_i]-err)<STALL_THRESH:
+                phase="approach"; continue
+
+            obs,*_=env.step(act); step+=1
+            if RENDER_EVERY and step%RENDER_EVERY==0: env.render()
+            continue
+
+        # fallback for approach / lower
+        track(tgt, ee_pos, act)
         obs,*_=env.step(act); step+=1
-        if step%RENDER_EVERY==0: env.render()
-        continue
-
-    # fallback for approach / lower
-    tgt = np.r_[tgt_xy,tgt_z]
-    dpos= np.clip(tgt-ee_pos, -SPEED_XY, SPEED_XY)
-    act = np.zeros(env.action_dim); act[:3]=dpos; act[6]=1
-    obs,*_=env.step(act); step+=1
-    if step%RENDER_EVERY==0: env.render()
-
-env.close()
-
-# ─── CSV output ----------------------------------------------
-impl  = os.path.basename(__file__).replace(".py","")
-trial = os.environ.get("TRIAL_IDX","0")
-total = time.time() - t0
-line  = [impl, trial, f"{total:.2f}",
-         f"{t_finish:.2f}" if t_finish else "NaN",
-         status]
-for sec,er in samples:
-    line.append(f"{sec}s:{er:.3f}")
-print(",".join(line))
-sys.stdout.flush()
+        if RENDER_EVERY and step%RENDER_EVERY==0: env.render()
+
+    # ─── CSV output ------------------------------------------
+    impl  = os.path.basename(__file__).replace(".py","")
+    total = time.time() - t0
+    line  = [impl, str(trial), f"{total:.2f}",
+             f"{t_finish:.2f}" if t_finish else "NaN",
+             status]
+    line += [f"{s}s:{e:.3f}" for s,e in zip(secs[:n], errs[:n])]
+    return ",".join(line)
+
+if __name__ == "__main__":
+    # ─── build env once, reuse it for every trial -------------
+    t_build = time.time()
+    cfg = load_composite_controller_config(controller="BASIC")
+    cfg["body_parts"]["right"]["type"] = "OSC_POSE"
+    env = suite.make("Lift","Panda",
+                     controller_configs=cfg,
+                     renderer="mujoco", has_renderer=RENDER_EVERY > 0,
+                     use_camera_obs=False, control_freq=60,
+                     ignore_done=True)
+    ENV_BUILD_SEC = time.time() - t_build
+
+    # compile the kernels before any trial clock starts
+    act, tgt = np.zeros(env.action_dim), np.zeros(3)
+    approach_target(np.zeros(2), np.ones(2), 0.0, tgt)
+    track(tgt, np.zeros(3), act)
+    push_step(np.zeros(2), np.zeros(3), np.ones(2), 0.0, act)
+
+    first  = int(os.environ.get("TRIAL_IDX","0"))
+    trials = int(os.environ.get("TRIALS","1"))
+    impl   = os.path.basename(__file__).replace(".py","")
+    for i in range(trials):
+        try:
+            print(run_trial(first + i), flush=True)   # on disk even if the process dies
+        except Exception:            # one broken trial must not drop the rest
+            traceback.print_exc()
+            print(f"{impl},{first + i},NaN,NaN,fail", flush=True)
+    env.close()
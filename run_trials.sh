@@ -1,14 +1,14 @@
 #!/usr/bin/env bash
 mkdir -p logs
 export PYTHONWARNINGS=ignore
+export RENDER_EVERY=0           # headless: logs are the only output
 
 impls=(push_pid.py push_mpc.py)
 
 for impl in "${impls[@]}"; do
   log="logs/${impl%.py}.csv"
-  > "$log"                     # truncate
-  for i in {1..60}; do
-    echo "▶ Running $impl  trial $i"
-    TRIAL_IDX=$i python -W ignore "$impl" >>"$log" 2>/dev/null
-  done
+  echo "▶ Running $impl  trials 1..60"
+  # one process per impl: env + imports are paid once, not per trial.
+  # a crashed trial is logged as "fail"; its traceback goes to the .err file
+  TRIAL_IDX=1 TRIALS=60 python -W ignore "$impl" >"$log" 2>"${log%.csv}.err"
 done